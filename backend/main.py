@@ -1,15 +1,41 @@
 import asyncio
-import json
+import functools
+import inspect
+import logging
 import os
+import queue
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Union
 
+import orjson
 import websockets
 from dotenv import load_dotenv
 import pyaudio
 
-from tools.function_mapper import FUNCTION_MAP
+from tools.function_mapper import FUNCTION_SPECS
+
+try:
+    import uvloop
+except ImportError:  # not available on Windows
+    uvloop = None
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def _configure_logging() -> QueueListener:
+    # Handlers write from a background thread; the event loop only enqueues records.
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, logging.StreamHandler())
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    listener.start()
+    return listener
+
 
 def sts_connect():
     api_key = os.getenv("DEEPGRAM_API_KEY")
@@ -17,48 +43,111 @@ def sts_connect():
         raise Exception("DEEPGRAM_API_KEY not found")
     return websockets.connect(
         "wss://agent.deepgram.com/v1/agent/converse",
-        subprotocols=["token", api_key]
+        subprotocols=["token", api_key],
+        # Audio dominates the traffic and does not deflate; skip per-frame compression.
+        compression=None,
+        max_size=2**20,
+        max_queue=32,
     )
 
 
+BASE_DIR = Path(__file__).resolve().parent
+
+
+@functools.lru_cache(maxsize=1)
 def load_config():
-    base_dir = os.path.dirname(__file__)
-    config_path = os.path.join(base_dir, "config.json")
-    prompt_path = os.path.join(base_dir, "prompts", "system_prompt.txt")
-    greeting_path = os.path.join(base_dir, "prompts", "greeting.txt")
-    
-    with open(config_path, "r") as f:
-        config = json.load(f)
-    
-    with open(prompt_path, "r") as f:
-        config["agent"]["think"]["prompt"] = f.read().strip()
-    
-    with open(greeting_path, "r") as f:
-        config["agent"]["greeting"] = f.read().strip()
-    
+    # Read once per process; reconnects reuse the same parsed config.
+    config = orjson.loads((BASE_DIR / "config.json").read_bytes())
+    config["agent"]["think"]["prompt"] = (BASE_DIR / "prompts" / "system_prompt.txt").read_text().strip()
+    config["agent"]["greeting"] = (BASE_DIR / "prompts" / "greeting.txt").read_text().strip()
     return config
 
 
+def _encode_message(payload: dict) -> str:
+    # Control messages must go out as text frames; websockets sends bytes as binary.
+    return orjson.dumps(payload).decode()
+
+
+# Settings message serialized once at import and sent as-is on every connect.
+_CONFIG_WIRE = _encode_message(load_config())
+
+
 CHUNK_MS = 20
 SAMPLE_RATE = 16000
 CHANNELS = 1
 SAMPLE_FORMAT = pyaudio.paInt16
 FRAMES_PER_BUFFER = int(SAMPLE_RATE * CHUNK_MS / 1000)
+BYTES_PER_FRAME = pyaudio.get_sample_size(SAMPLE_FORMAT) * CHANNELS
+SILENCE = bytes(FRAMES_PER_BUFFER * BYTES_PER_FRAME)
+# Captured frames waiting to be sent; the oldest are dropped once full to bound latency.
+CAPTURE_QUEUE_FRAMES = 8
+# Received chunks waiting to be played. Speech arrives faster than real time, so
+# this holds whole responses and only guards against unbounded growth.
+PLAYBACK_QUEUE_CHUNKS = 1024
+# Frames coalesced into each ws.send (2 x 20 ms = 40 ms of audio per message).
+SEND_BATCH_FRAMES = 2
+# Function call requests handled at once; further requests wait for a free slot.
+MAX_CONCURRENT_FUNCTION_CALLS = 4
+
+
+def _make_capture_callback(loop, capture_queue: asyncio.Queue):
+    def enqueue(data):
+        if capture_queue.full():
+            capture_queue.get_nowait()
+        capture_queue.put_nowait(data)
+
+    def on_audio(in_data, frame_count, time_info, status):
+        # Runs on PortAudio's thread; hand the frame to the event loop.
+        try:
+            loop.call_soon_threadsafe(enqueue, in_data)
+        except RuntimeError:
+            # Event loop already closed during shutdown.
+            return (None, pyaudio.paComplete)
+        return (None, pyaudio.paContinue)
+
+    return on_audio
+
+
+def _make_playback_callback(playback: deque):
+    silence = memoryview(SILENCE)
+    head = memoryview(b"")
 
+    def on_play(in_data, frame_count, time_info, status):
+        # Runs on PortAudio's thread; queued chunks are sliced through
+        # memoryviews so only the returned buffer is allocated.
+        nonlocal head
+        needed = frame_count * BYTES_PER_FRAME
+        parts = []
+        while needed:
+            if not head:
+                if not playback:
+                    # Underrun: pad the rest of the buffer with silence.
+                    parts.append(silence[:needed] if needed <= len(silence) else bytes(needed))
+                    break
+                head = memoryview(playback.popleft())
+            part = head[:needed]
+            head = head[len(part):]
+            parts.append(part)
+            needed -= len(part)
+        return (b"".join(parts), pyaudio.paContinue)
 
-async def audio_sender(ws, in_stream):
-    loop = asyncio.get_event_loop()
+    return on_play
+
+
+async def audio_sender(ws, capture_queue: asyncio.Queue):
     while True:
-        data = await loop.run_in_executor(None, in_stream.read, FRAMES_PER_BUFFER)
-        await ws.send(data)
+        frames = [await capture_queue.get() for _ in range(SEND_BATCH_FRAMES)]
+        await ws.send(b"".join(frames))
 
 
-def _create_function_call_response(func_id: str, func_name: str, result: dict):
+def _create_function_call_response(func_id: str, func_name: str, result: Union[dict, str]):
+    # Deepgram expects `content` as a string; text results are passed through
+    # as-is rather than being JSON-encoded a second time.
     return {
         "type": "FunctionCallResponse",
         "id": func_id,
         "name": func_name,
-        "content": json.dumps(result),
+        "content": result if isinstance(result, str) else orjson.dumps(result).decode(),
     }
 
 
@@ -68,48 +157,82 @@ async def _handle_function_call_request(decoded: dict, ws):
             func_name = function_call.get("name")
             func_id = function_call.get("id")
             try:
-                arguments = json.loads(function_call.get("arguments", "{}"))
-            except Exception:
+                arguments = orjson.loads(function_call.get("arguments", "{}"))
+            except (orjson.JSONDecodeError, TypeError):
+                arguments = {}
+            if not isinstance(arguments, dict):
                 arguments = {}
 
-            if func_name in FUNCTION_MAP:
-                try:
-                    print(f"Calling function: {func_name} with arguments: {arguments}")
-                    result = FUNCTION_MAP[func_name](**arguments)
-                except TypeError:
-                    expr = arguments.get("expression") or arguments.get("query") or arguments.get("input")
-                    result = FUNCTION_MAP[func_name](expr)
+            spec = FUNCTION_SPECS.get(func_name)
+            if spec is not None:
+                func, params = spec
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Calling function: %s with arguments: %s", func_name, arguments)
+                args = ()
+                kwargs = {k: v for k, v in arguments.items() if k in params}
+                if not kwargs and params:
+                    # No recognised keyword; pass the likely free-text argument positionally.
+                    args = (arguments.get("expression") or arguments.get("query") or arguments.get("input"),)
+                if inspect.iscoroutinefunction(func):
+                    result = await func(*args, **kwargs)
+                else:
+                    # Sync tools run in a worker thread so they cannot stall the event loop.
+                    result = await asyncio.to_thread(func, *args, **kwargs)
             else:
                 result = {"error": f"Unknown function: {func_name}"}
 
             response = _create_function_call_response(func_id, func_name, result)
-            await ws.send(json.dumps(response))
+            await ws.send(_encode_message(response))
     except Exception as e:
         err = _create_function_call_response(
             func_id if "func_id" in locals() else "unknown",
             func_name if "func_name" in locals() else "unknown",
             {"error": f"Function call failed: {str(e)}"},
         )
-        await ws.send(json.dumps(err))
+        await ws.send(_encode_message(err))
 
 
-async def audio_receiver(ws, out_stream):
-    async for message in ws:
-        if isinstance(message, (bytes, bytearray)):
-            out_stream.write(message)
-        else:
-            try:
-                decoded = json.loads(message)
-                if decoded.get("type") == "FunctionCallRequest":
-                    await _handle_function_call_request(decoded, ws)
-            except Exception:
-                pass
+# Only function call requests are acted on; other control messages are skipped
+# with a substring check instead of a full JSON decode.
+_FUNCTION_CALL_REQUEST_TAG = '"FunctionCallRequest"'
+
+
+async def _dispatch_function_call_request(decoded: dict, ws, slots: asyncio.Semaphore):
+    async with slots:
+        await _handle_function_call_request(decoded, ws)
+
+
+async def audio_receiver(ws, playback: deque):
+    # Function calls run as separate tasks so receiving (and playback) never waits on a tool.
+    slots = asyncio.Semaphore(MAX_CONCURRENT_FUNCTION_CALLS)
+    dispatches = set()
+    try:
+        async for message in ws:
+            if isinstance(message, (bytes, bytearray)):
+                playback.append(message)
+            else:
+                if _FUNCTION_CALL_REQUEST_TAG not in message:
+                    continue
+                try:
+                    decoded = orjson.loads(message)
+                except orjson.JSONDecodeError:
+                    continue
+                if isinstance(decoded, dict) and decoded.get("type") == "FunctionCallRequest":
+                    task = asyncio.create_task(_dispatch_function_call_request(decoded, ws, slots))
+                    dispatches.add(task)
+                    task.add_done_callback(dispatches.discard)
+    finally:
+        for task in dispatches:
+            task.cancel()
 
 
 async def run_agent():
     pa = pyaudio.PyAudio()
     in_stream = None
     out_stream = None
+    capture_queue = asyncio.Queue(maxsize=CAPTURE_QUEUE_FRAMES)
+    # Start with one buffer of silence so the first callback does not underrun.
+    playback = deque([SILENCE], maxlen=PLAYBACK_QUEUE_CHUNKS)
 
     try:
         in_stream = pa.open(
@@ -118,6 +241,7 @@ async def run_agent():
             rate=SAMPLE_RATE,
             input=True,
             frames_per_buffer=FRAMES_PER_BUFFER,
+            stream_callback=_make_capture_callback(asyncio.get_running_loop(), capture_queue),
         )
         out_stream = pa.open(
             format=SAMPLE_FORMAT,
@@ -125,15 +249,15 @@ async def run_agent():
             rate=SAMPLE_RATE,
             output=True,
             frames_per_buffer=FRAMES_PER_BUFFER,
+            stream_callback=_make_playback_callback(playback),
         )
 
         async with sts_connect() as ws:
-            config_message = load_config()
-            await ws.send(json.dumps(config_message))
-            print("Connected to Deepgram agent. Speak into your microphone. Press Ctrl+C to exit.")
+            await ws.send(_CONFIG_WIRE)
+            logger.info("Connected to Deepgram agent. Speak into your microphone. Press Ctrl+C to exit.")
 
-            sender_task = asyncio.create_task(audio_sender(ws, in_stream))
-            receiver_task = asyncio.create_task(audio_receiver(ws, out_stream))
+            sender_task = asyncio.create_task(audio_sender(ws, capture_queue))
+            receiver_task = asyncio.create_task(audio_receiver(ws, playback))
 
             await asyncio.gather(sender_task, receiver_task)
 
@@ -154,10 +278,16 @@ async def run_agent():
 
 
 def main():
+    listener = _configure_logging()
     try:
-        asyncio.run(run_agent())
+        if uvloop is not None:
+            uvloop.run(run_agent())
+        else:
+            asyncio.run(run_agent())
     except KeyboardInterrupt:
         print("\nExiting...")
+    finally:
+        listener.stop()
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import ast
+import functools
 import operator as op
 
 # Allowed operators for safe evaluation
@@ -17,32 +18,92 @@ _ALLOWED_UNARY_OPS = {
 }
 
 
-def _safe_eval_node(node, depth=0):
-    if depth > 20:
-        raise ValueError("Expression too complex")
+_MAX_DEPTH = 20
 
-    if isinstance(node, ast.Expression):
-        return _safe_eval_node(node.body, depth + 1)
 
-    if isinstance(node, ast.Constant):
-        if isinstance(node.value, (int, float)):
-            return node.value
+# Node handlers append the node's instruction to `program` and queue its
+# children on `pending` (right child last, so it is emitted first).
+def _h_expression(node, depth, program, pending):
+    pending.append((node.body, depth + 1))
+
+
+def _h_constant(node, depth, program, pending):
+    if not isinstance(node.value, (int, float)):
         raise ValueError("Only numbers are allowed")
+    program.append(node.value)
+
+
+def _h_unary(node, depth, program, pending):
+    func = _ALLOWED_UNARY_OPS.get(type(node.op))
+    if func is None:
+        raise ValueError("Unsupported expression")
+    program.append((func, 1))
+    pending.append((node.operand, depth + 1))
 
-    if isinstance(node, ast.UnaryOp) and type(node.op) in _ALLOWED_UNARY_OPS:
-        operand = _safe_eval_node(node.operand, depth + 1)
-        return _ALLOWED_UNARY_OPS[type(node.op)](operand)
 
-    if isinstance(node, ast.BinOp) and type(node.op) in _ALLOWED_BIN_OPS:
-        left = _safe_eval_node(node.left, depth + 1)
-        right = _safe_eval_node(node.right, depth + 1)
+def _h_binop(node, depth, program, pending):
+    func = _ALLOWED_BIN_OPS.get(type(node.op))
+    if func is None:
+        raise ValueError("Unsupported expression")
+    program.append((func, 2))
+    pending.append((node.left, depth + 1))
+    pending.append((node.right, depth + 1))
+
+
+_HANDLERS = {
+    ast.Expression: _h_expression,
+    ast.Constant: _h_constant,
+    ast.UnaryOp: _h_unary,
+    ast.BinOp: _h_binop,
+}
+
+
+def _to_postfix(tree):
+    """Flatten a parsed expression into postfix order, validating each node.
+
+    Constants become numbers; operators become (function, arity) pairs.
+    """
+    program = []
+    pending = [(tree, 0)]
+    while pending:
+        node, depth = pending.pop()
+        if depth > _MAX_DEPTH:
+            raise ValueError("Expression too complex")
+        handler = _HANDLERS.get(type(node))
+        if handler is None:
+            raise ValueError("Unsupported expression")
+        handler(node, depth, program, pending)
+
+    # Nodes were emitted root-first with right before left; reverse into postfix.
+    program.reverse()
+    return program
+
+
+def _safe_eval_node(node):
+    stack = []
+    for item in _to_postfix(node):
+        if type(item) is not tuple:
+            stack.append(item)
+            continue
+        func, arity = item
+        if arity == 1:
+            stack.append(func(stack.pop()))
+            continue
+        right = stack.pop()
+        left = stack.pop()
         # Guard against excessively large exponentiation
-        if isinstance(node.op, ast.Pow):
+        if func is op.pow:
             if abs(left) > 1e6 or abs(right) > 12:
                 raise ValueError("Exponent too large")
-        return _ALLOWED_BIN_OPS[type(node.op)](left, right)
+        stack.append(func(left, right))
+    return stack.pop()
+
 
-    raise ValueError("Unsupported expression")
+@functools.lru_cache(maxsize=256)
+def _evaluate(expr: str):
+    # Expressions contain only literals, so the result depends on the text alone.
+    tree = ast.parse(expr, mode="eval")
+    return _safe_eval_node(tree)
 
 
 def calculate(expression: str):
@@ -57,8 +118,7 @@ def calculate(expression: str):
             return {"error": "Empty expression"}
         # Normalize caret exponent to Python exponent
         expr = expr.replace("^", "**")
-        tree = ast.parse(expr, mode="eval")
-        result = _safe_eval_node(tree)
+        result = _evaluate(expr)
         # Normalize -0.0 to 0.0
         if isinstance(result, float) and result == 0:
             result = 0.0
@@ -1,3 +1,5 @@
+import inspect
+
 from tools.calculator import calculate
 from tools.plaid_tool import get_financial_info
 
@@ -5,3 +7,9 @@ FUNCTION_MAP = {
     "calculate": calculate,
     "get_financial_info": get_financial_info,
 }
+
+# Calling conventions resolved once: name -> (function, accepted parameters)
+FUNCTION_SPECS = {
+    name: (func, inspect.signature(func).parameters)
+    for name, func in FUNCTION_MAP.items()
+}
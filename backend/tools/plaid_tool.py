@@ -1,10 +1,26 @@
+import asyncio
+import functools
+import itertools
 import os
-import json
 from datetime import datetime, timedelta, date, timezone
 from pathlib import Path
-from typing import Dict, List, Tuple, Union, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Union, Optional
+
+import orjson
 from dotenv import load_dotenv
 
+try:
+    from plaid import ApiClient, Configuration, Environment
+    from plaid.api import plaid_api
+    from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
+    from plaid.model.transactions_get_request import TransactionsGetRequest
+    from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
+except ImportError as e:
+    # Reported when the tool is first used, so the agent can still start without Plaid.
+    _PLAID_IMPORT_ERROR: Optional[ImportError] = e
+else:
+    _PLAID_IMPORT_ERROR = None
+
 load_dotenv()
 
 
@@ -64,6 +80,19 @@ NAME_SYNONYMS: Dict[str, List[str]] = {
     "pnc": ["pnc", "pnc bank", "pnc checking", "pnc savings"],
 }
 
+# Flattened lookup: any accepted spelling (including the canonical name) -> canonical
+_SYNONYM_TO_CANONICAL: Dict[str, str] = {
+    **{friendly: friendly for friendly in FRIENDLY_TO_ENV},
+    **{variant: canonical for canonical, variants in NAME_SYNONYMS.items() for variant in variants},
+}
+
+# Access tokens present in the environment at import time, keyed by friendly name
+_AVAILABLE_TOKENS: Dict[str, str] = {
+    friendly: token
+    for friendly, env_key in FRIENDLY_TO_ENV.items()
+    if (token := os.getenv(env_key))
+}
+
 
 def _normalize_account_name(name: str) -> Optional[str]:
     if not name:
@@ -71,13 +100,7 @@ def _normalize_account_name(name: str) -> Optional[str]:
     s = name.strip().lower()
     if s == "all":
         return "all"
-    for canonical, variants in NAME_SYNONYMS.items():
-        if s in variants:
-            return canonical
-    # fallback: if user typed the canonical as-is
-    if s in FRIENDLY_TO_ENV:
-        return s
-    return None
+    return _SYNONYM_TO_CANONICAL.get(s)
 
 
 def _resolve_selected_accounts(account_names: Union[str, List[str]]) -> List[Tuple[str, str]]:
@@ -86,12 +109,7 @@ def _resolve_selected_accounts(account_names: Union[str, List[str]]) -> List[Tup
     Returns list of tuples. Skips accounts without tokens set. If none resolved,
     raises ValueError with a helpful message.
     """
-    # Build reverse map for validation
-    available: Dict[str, str] = {}
-    for friendly, env_key in FRIENDLY_TO_ENV.items():
-        token = os.getenv(env_key)
-        if token:
-            available[friendly] = token
+    available = _AVAILABLE_TOKENS
 
     def resolve_all() -> List[Tuple[str, str]]:
         return [(friendly, token) for friendly, token in available.items()]
@@ -126,14 +144,13 @@ def _resolve_selected_accounts(account_names: Union[str, List[str]]) -> List[Tup
     return resolved
 
 
+@functools.lru_cache(maxsize=1)
 def _init_plaid_client():
-    try:
-        from plaid import ApiClient, Configuration, Environment
-        from plaid.api import plaid_api
-    except Exception as e:
+    # One client per process so its urllib3 pool keeps connections to Plaid alive.
+    if _PLAID_IMPORT_ERROR is not None:
         raise RuntimeError(
             "Missing dependency 'plaid-python'. Install with: pip install plaid-python"
-        ) from e
+        ) from _PLAID_IMPORT_ERROR
 
     client_id = os.getenv("PLAID_CLIENT_ID")
     secret = os.getenv("PLAID_SECRET")
@@ -163,20 +180,66 @@ def _parse_date(d: Optional[str]) -> Optional[date]:
         raise ValueError("Dates must be in YYYY-MM-DD format")
 
 
+# Currency symbols used in place of the "<code> " prefix
+_CURRENCY_PREFIXES: Dict[str, str] = {"USD": "$"}
+
+
 def _format_money(amount: Optional[float], currency: Optional[str]) -> str:
     if amount is None:
         return "unknown"
     cur = currency or "USD"
-    prefix = "$" if cur.upper() == "USD" else f"{cur} "
+    prefix = _CURRENCY_PREFIXES.get(cur.upper()) or f"{cur} "
     # Show commas and two decimals
     return f"{prefix}{amount:,.2f}"
 
 
+def _enum_value(value):
+    # Plaid enum models (account type/subtype) wrap their string in `.value`.
+    return getattr(value, "value", value)
+
+
+def _acct_to_dict(acct) -> Dict:
+    """Copy the account fields used for summaries and exports off a Plaid model.
+
+    Reading attributes directly avoids `to_dict()`, which deep-copies the whole model.
+    """
+    balances = acct.balances
+    return {
+        "account_id": acct.account_id,
+        "name": acct.get("name"),
+        "official_name": acct.get("official_name"),
+        "type": _enum_value(acct.get("type")),
+        "subtype": _enum_value(acct.get("subtype")),
+        "balances": {
+            "available": balances.get("available"),
+            "current": balances.get("current"),
+            "limit": balances.get("limit"),
+            "iso_currency_code": balances.get("iso_currency_code"),
+            "unofficial_currency_code": balances.get("unofficial_currency_code"),
+        },
+    }
+
+
+def _txn_to_dict(tx) -> Dict:
+    """Copy the transaction fields used for exports off a Plaid model."""
+    return {
+        "account_id": tx.get("account_id"),
+        "transaction_id": tx.get("transaction_id"),
+        "date": tx.get("date"),
+        "name": tx.get("name"),
+        "merchant_name": tx.get("merchant_name"),
+        "amount": tx.get("amount"),
+        "iso_currency_code": tx.get("iso_currency_code"),
+        "unofficial_currency_code": tx.get("unofficial_currency_code"),
+        "pending": tx.get("pending"),
+        "category": tx.get("category"),
+    }
+
+
 def _fetch_balances(client, access_token: str) -> Dict:
-    from plaid.model.accounts_balance_get_request import AccountsBalanceGetRequest
     req = AccountsBalanceGetRequest(access_token=access_token)
     resp = client.accounts_balance_get(req)
-    return resp.to_dict()
+    return {"accounts": [_acct_to_dict(a) for a in resp.accounts]}
 
 
 def _fetch_transactions(
@@ -185,12 +248,9 @@ def _fetch_transactions(
     start_date: date,
     end_date: date,
 ) -> Dict:
-    from plaid.model.transactions_get_request import TransactionsGetRequest
-    from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
-
     all_transactions = []
     accounts_cache = None
-    count = 100
+    count = 500  # Plaid's maximum page size for /transactions/get
     offset = 0
 
     while True:
@@ -202,12 +262,10 @@ def _fetch_transactions(
             options=options,
         )
         resp = client.transactions_get(req)
-        data = resp.to_dict()
         if accounts_cache is None:
-            accounts_cache = data.get("accounts", [])
-        txns = data.get("transactions", [])
-        all_transactions.extend(txns)
-        total = data.get("total_transactions", len(all_transactions))
+            accounts_cache = [_acct_to_dict(a) for a in resp.accounts]
+        all_transactions.extend(_txn_to_dict(tx) for tx in resp.transactions)
+        total = resp.get("total_transactions", len(all_transactions))
         if len(all_transactions) >= total:
             break
         offset = len(all_transactions)
@@ -215,56 +273,97 @@ def _fetch_transactions(
     return {"accounts": accounts_cache or [], "transactions": all_transactions}
 
 
+def _balance_line(acct: Dict) -> str:
+    name = acct.get("name") or acct.get("official_name") or "Account"
+    subtype = acct.get("subtype") or acct.get("type") or ""
+    balances = acct.get("balances", {})
+    currency = balances.get("iso_currency_code") or balances.get("unofficial_currency_code")
+    limit_amt = balances.get("limit")
+
+    label = f"{name} ({subtype})" if subtype else name
+    limit_str = "" if limit_amt is None else f", limit {_format_money(limit_amt, currency)}"
+    return (
+        f"- {label}: available {_format_money(balances.get('available'), currency)}, "
+        f"current {_format_money(balances.get('current'), currency)}{limit_str}"
+    )
+
+
 def _summarize_balances(institution: str, balance_payload: Dict) -> str:
-    lines: List[str] = []
     accounts = balance_payload.get("accounts", [])
     if not accounts:
         return f"{institution.title()}: No accounts found."
-    lines.append(f"{institution.title()}:")
-    for acct in accounts:
-        name = acct.get("name") or acct.get("official_name") or "Account"
-        subtype = acct.get("subtype") or acct.get("type") or ""
-        balances = acct.get("balances", {})
-        available = balances.get("available")
-        current = balances.get("current")
-        limit_amt = balances.get("limit")
-        currency = balances.get("iso_currency_code") or balances.get("unofficial_currency_code")
-
-        bal_str = f"available {_format_money(available, currency)}, current {_format_money(current, currency)}"
-        if limit_amt is not None:
-            bal_str += f", limit {_format_money(limit_amt, currency)}"
-        if subtype:
-            lines.append(f"- {name} ({subtype}): {bal_str}")
-        else:
-            lines.append(f"- {name}: {bal_str}")
+    lines = [f"{institution.title()}:"]
+    lines.extend(_balance_line(acct) for acct in accounts)
     return "\n".join(lines)
 
 
+def _transaction_records(institution: str, data: Union[Dict, Exception]) -> Iterator[Dict]:
+    """Yield output records for one institution's fetch result.
+
+    A failed fetch (or a malformed payload) yields a single error record instead.
+    """
+    try:
+        if isinstance(data, Exception):
+            raise data
+        accounts = {a.get("account_id"): a for a in (data.get("accounts") or [])}
+        for tx in data.get("transactions") or []:
+            acct = accounts.get(tx.get("account_id"), {})
+            acct_name = acct.get("name") or acct.get("official_name") or "Account"
+            currency = tx.get("iso_currency_code") or tx.get("unofficial_currency_code")
+            tdate = tx.get("date")
+            if isinstance(tdate, (date, datetime)):
+                tdate = tdate.isoformat()
+            yield {
+                "institution": institution,
+                "account_id": tx.get("account_id"),
+                "account_name": acct_name,
+                "transaction_id": tx.get("transaction_id"),
+                "date": tdate,
+                "name": tx.get("name"),
+                "merchant_name": tx.get("merchant_name"),
+                "amount": tx.get("amount"),
+                "currency": currency,
+                "pending": tx.get("pending"),
+                "category": tx.get("category"),
+            }
+    except Exception as e:
+        yield {
+            "institution": institution,
+            "error": f"error fetching transactions: {str(e)}",
+        }
+
+
 def _write_transactions_file(
     base_dir: Path,
     institutions: List[str],
     overall_start: date,
     overall_end: date,
-    collected: List[Dict],
+    records: Iterable[Dict],
 ) -> str:
     tmp_dir = base_dir / "tmp"
     tmp_dir.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
     out_path = tmp_dir / f"plaid_transactions_{timestamp}.json"
 
-    payload = {
+    header = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "date_range": {"start_date": overall_start.isoformat(), "end_date": overall_end.isoformat()},
         "institutions": institutions,
-        "transactions": collected,
     }
 
-    with out_path.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    # Records are written one at a time so the full list is never held in memory.
+    with out_path.open("wb") as f:
+        f.write(orjson.dumps(header)[:-1])  # drop the closing brace to append "transactions"
+        f.write(b',"transactions":[')
+        for i, record in enumerate(records):
+            if i:
+                f.write(b",")
+            f.write(orjson.dumps(record))
+        f.write(b"]}")
     return str(out_path)
 
 
-def get_financial_info(
+async def get_financial_info(
     account_names: Union[str, List[str]],
     request_type: str,
     start_date: Optional[str] = None,
@@ -295,13 +394,17 @@ def get_financial_info(
             return {"error": "Invalid request_type. Use 'balance' or 'transactions'."}
 
         if rtype in ("balance", "balances"):
+            # Institutions are fetched concurrently; each blocking call runs in a worker thread.
+            balances = await asyncio.gather(
+                *(asyncio.to_thread(_fetch_balances, client, token) for _, token in selected),
+                return_exceptions=True,
+            )
             summaries: List[str] = []
-            for friendly, token in selected:
-                try:
-                    bal = _fetch_balances(client, token)
+            for (friendly, _), bal in zip(selected, balances):
+                if isinstance(bal, Exception):
+                    summaries.append(f"{friendly.title()}: error fetching balances: {str(bal)}")
+                else:
                     summaries.append(_summarize_balances(friendly, bal))
-                except Exception as e:
-                    summaries.append(f"{friendly.title()}: error fetching balances: {str(e)}")
             return "\n\n".join(summaries)
 
         # Transactions
@@ -314,45 +417,21 @@ def get_financial_info(
         if not end_d:
             end_d = date.today()
 
-        collected_txns: List[Dict] = []
-        institutions: List[str] = []
-
-        for friendly, token in selected:
-            institutions.append(friendly.title())
-            try:
-                data = _fetch_transactions(client, token, start_d, end_d)
-                accounts = {a.get("account_id"): a for a in (data.get("accounts") or [])}
-                for tx in data.get("transactions") or []:
-                    acct = accounts.get(tx.get("account_id"), {})
-                    acct_name = acct.get("name") or acct.get("official_name") or "Account"
-                    currency = tx.get("iso_currency_code") or tx.get("unofficial_currency_code")
-                    tdate = tx.get("date")
-                    if isinstance(tdate, (date, datetime)):
-                        tdate = tdate.isoformat()
-                    collected_txns.append(
-                        {
-                            "institution": friendly.title(),
-                            "account_id": tx.get("account_id"),
-                            "account_name": acct_name,
-                            "transaction_id": tx.get("transaction_id"),
-                            "date": tdate,
-                            "name": tx.get("name"),
-                            "merchant_name": tx.get("merchant_name"),
-                            "amount": tx.get("amount"),
-                            "currency": currency,
-                            "pending": tx.get("pending"),
-                            "category": tx.get("category"),
-                        }
-                    )
-            except Exception as e:
-                collected_txns.append(
-                    {
-                        "institution": friendly.title(),
-                        "error": f"error fetching transactions: {str(e)}",
-                    }
-                )
-
-        out_file = _write_transactions_file(base_dir, institutions, start_d, end_d, collected_txns)
+        fetched = await asyncio.gather(
+            *(
+                asyncio.to_thread(_fetch_transactions, client, token, start_d, end_d)
+                for _, token in selected
+            ),
+            return_exceptions=True,
+        )
+
+        institutions = [friendly.title() for friendly, _ in selected]
+        records = itertools.chain.from_iterable(
+            _transaction_records(institution, data) for institution, data in zip(institutions, fetched)
+        )
+        out_file = await asyncio.to_thread(
+            _write_transactions_file, base_dir, institutions, start_d, end_d, records
+        )
         return {"transactions_file": out_file}
 
     except Exception as e:
@@ -361,9 +440,9 @@ def get_financial_info(
 
 if __name__ == "__main__":
     print("--- Testing Balances for Discover ---")
-    balances = get_financial_info("discover", "balance")
+    balances = asyncio.run(get_financial_info("discover", "balance"))
     print(balances)
 
     print("\n--- Testing Transactions for Discover ---")
-    transactions = get_financial_info("discover", "transactions")
+    transactions = asyncio.run(get_financial_info("discover", "transactions"))
     print(transactions)